@@ -1 +1,8 @@
-from .numba_passthru import PassThruContainer, PassThruType, pass_thru_type
\ No newline at end of file
+from .numba_passthru import PassThruContainer, PassThruType, pass_thru_type
+from .structref import PassThruStructRef, PassThruStructRefProxy
+from .typedlist import from_pass_thru_list, to_pass_thru_list
+
+try:
+    from .sharedmem import SharedPassThruRecords
+except ImportError:  # multiprocessing.shared_memory requires Python 3.8
+    pass
@@ -0,0 +1,142 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+from numba import njit
+from numba.core.errors import TypingError
+from numba.core.registry import cpu_target
+from numba.np.numpy_support import as_dtype
+
+from .typedlist import to_pass_thru_list
+
+
+__all__ = ['SharedPassThruRecords']
+
+
+_export_kernels = {}
+
+
+def _export_kernel(fields):
+    """Returns a jitted ``export(objs, records)`` copying ``fields`` from a typed list of pass-thru extension types
+       into a record array.
+    """
+    try:
+        return _export_kernels[fields]
+    except KeyError:
+        pass
+
+    # Build source code for the kernel
+    indent = ' ' * 8
+    copy_fields = '\n'.join("{}records[ii].{} = obj.{}".format(indent, f, f) for f in fields)
+    source = """
+def export(objs, records):
+    for ii in range(len(objs)):
+        obj = objs[ii]
+{}
+""".format(copy_fields)
+
+    glbs = {}
+    exec(source, glbs)
+    kernel = _export_kernels[fields] = njit(glbs['export'])
+
+    return kernel
+
+
+def _records_dtype(typ, fields):
+    typingctx = cpu_target.typing_context
+    typingctx.refresh()
+
+    dtype = []
+    for field in fields:
+        attrty = typingctx.resolve_getattr(typ, field)
+        if attrty is None:
+            raise TypingError("{} has no attribute '{}'".format(typ, field))
+        try:
+            dtype.append((field, as_dtype(attrty)))
+        except (NotImplementedError, TypingError):  # NumbaNotImplementedError is a TypingError in later Numba versions
+            raise TypingError("{} attribute '{}' of type {} has no NumPy dtype".format(typ, field, attrty))
+
+    return np.dtype(dtype, align=True)
+
+
+class SharedPassThruRecords(object):
+    """Exports native attributes of pass-thru extension types into a record array backed by shared memory. Row
+       ``ii`` of ``records`` holds the attributes of ``objs[ii]``, row indices serve as handles to map results
+       back to the original objects.
+
+       ``item_type`` defaults to the type of the first object and is required if ``objs`` is empty.
+
+       Pickling only transfers the name of the shared memory block, hence instances can be sent to worker processes
+       (eg via ``ProcessPoolExecutor``) without pickling the objects. Handles can only be resolved in the exporting
+       process, which also owns the shared memory block and unlinks it on ``close``.
+    """
+
+    def __init__(self, objs, fields, item_type=None):
+        self._objs = list(objs)
+        self._owner = True
+
+        if not self._objs and item_type is None:
+            raise ValueError("item_type is required to export an empty sequence")
+
+        pass_thru_list = to_pass_thru_list(self._objs, item_type)
+        fields = tuple(fields)
+        dtype = _records_dtype(pass_thru_list._list_type.item_type, fields)
+
+        # zero-sized shared memory is not supported
+        self._shm = shared_memory.SharedMemory(create=True, size=max(dtype.itemsize * len(self._objs), 1))
+        self.records = np.frombuffer(self._shm.buf, dtype=dtype, count=len(self._objs))
+
+        try:
+            _export_kernel(fields)(pass_thru_list, self.records)
+        except BaseException:
+            # the traceback can still reference records, the block is unmapped once it is gone but unlinked now
+            try:
+                self.close()
+            except BufferError:
+                pass
+            raise
+
+    def __getstate__(self):
+        return self._shm.name, self.records.dtype, len(self.records)
+
+    def __setstate__(self, state):
+        name, dtype, count = state
+
+        self._objs = None
+        self._owner = False
+        self._shm = shared_memory.SharedMemory(name=name)
+        self.records = np.frombuffer(self._shm.buf, dtype=dtype, count=count)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def lookup(self, handles):
+        """Returns the original objects for ``handles``, ie row indices into ``records``.
+        """
+        if self._objs is None:
+            raise RuntimeError("handles can only be resolved in the exporting process")
+
+        return [self._objs[h] for h in handles]
+
+    def close(self):
+        """Releases the shared memory block, the exporting process also unlinks it. Raises ``BufferError`` while
+           views of ``records`` are still alive, ``close`` can be called again once they are gone.
+        """
+        if self._shm is None:
+            return
+
+        # records holds an export of the buffer, the block cannot be closed before all views are gone
+        self.records = None
+        try:
+            self._shm.close()
+        finally:
+            # unlink regardless, the name is not needed to keep an open block alive
+            if self._owner:
+                self._shm.unlink()
+                self._owner = False
+        self._shm = None
@@ -0,0 +1,121 @@
+from numba import njit
+from numba.core import cgutils, types
+from numba.core.datamodel import default_manager, models
+from numba.core.errors import TypingError
+from numba.experimental import structref
+from numba.extending import box, intrinsic, register_model
+
+from .numba_passthru import PassThruType
+
+
+__all__ = ['PassThruStructRef', 'PassThruStructRefProxy']
+
+
+class BorrowedPyObject(types.Opaque):
+    """A ``PyObject *`` borrowed from a live pass-thru member. Only meant to be returned straight to the
+       interpreter, no references are held in *nopython-mode*.
+    """
+    def __init__(self):
+        super(BorrowedPyObject, self).__init__('BorrowedPyObject')
+
+
+borrowed_pyobject = BorrowedPyObject()
+
+
+register_model(BorrowedPyObject)(models.OpaqueModel)
+
+
+@box(BorrowedPyObject)
+def box_borrowed_pyobject(typ, val, context):
+    # the owner of the reference is still alive while the return value is boxed, taking a Python reference
+    # is all that is needed
+    context.pyapi.incref(val)
+
+    return val
+
+
+def _pass_thru_members(typ):
+    """Returns the member names leading from a pass-thru type to the ``MemInfoPointer`` holding the
+       ``PyObject``. Pass-thru extension types are followed via their ``parent`` member, ``PassThruContainer`` via
+       its ``container`` member.
+    """
+    if not isinstance(typ, PassThruType):
+        raise TypingError("{} is not a pass-thru type".format(typ))
+
+    model = default_manager[typ]
+    try:
+        model.get_member_fe_type('meminfo')
+        return ('meminfo',)
+    except KeyError:
+        pass
+
+    for member in ('parent', 'container'):
+        try:
+            member_type = model.get_member_fe_type(member)
+        except KeyError:
+            continue
+
+        return (member,) + _pass_thru_members(member_type)
+
+    raise TypingError("{} has none of the members 'meminfo', 'parent' or 'container'".format(typ))
+
+
+@intrinsic
+def _structref_get_parent_object(tyctx, st):
+    if not isinstance(st, PassThruStructRef):
+        raise TypingError("{} is not a PassThruStructRef".format(st))
+
+    members = _pass_thru_members(st.field_dict['parent'])
+    funtion_sig = borrowed_pyobject(st)
+
+    def codegen(cgctx, builder, signature, args):
+        # read the parent straight from the payload, the structref argument keeps it alive hence no
+        # NRT incref/decref on the pass-thru member is needed
+        struct_type = signature.args[0]
+        st = cgutils.create_struct_proxy(struct_type)(cgctx, builder, value=args[0])
+        data_type = struct_type.get_data_type()
+        data_ptr = builder.bitcast(
+            cgctx.nrt.meminfo_data(builder, st.meminfo),
+            cgctx.data_model_manager[data_type].get_value_type().as_pointer()
+        )
+        data = cgutils.create_struct_proxy(data_type)(cgctx, builder, ref=data_ptr)
+
+        typ, val = struct_type.field_dict['parent'], data.parent
+        for member in members:
+            proxy = cgutils.create_struct_proxy(typ)(cgctx, builder, value=val)
+            typ, val = cgctx.data_model_manager[typ].get_member_fe_type(member), getattr(proxy, member)
+
+        return cgctx.nrt.meminfo_data(builder, val)
+
+    return funtion_sig, codegen
+
+
+@njit
+def _structref_get_parent(st):
+    return _structref_get_parent_object(st)
+
+
+class PassThruStructRef(types.StructRef):
+    """Base class for mutable structs carrying a link to their Python parent in a pass-thru member called
+       ``parent``. Subclasses need registering with ``numba.experimental.structref.register`` like any other
+       ``StructRef``.
+    """
+    def preprocess_fields(self, fields):
+        fields = tuple((name, types.unliteral(typ)) for name, typ in fields)
+        if not isinstance(dict(fields).get('parent'), PassThruType):
+            raise TypingError("{} requires a pass-thru member 'parent'".format(self.__class__.__name__))
+        # reject parents that cannot be boxed back when building the struct rather than on first access
+        _pass_thru_members(dict(fields)['parent'])
+
+        return fields
+
+
+class PassThruStructRefProxy(structref.StructRefProxy):
+    """Proxy for ``PassThruStructRef``. ``parent`` gives back the original Python object, the ``PyObject`` is
+       read directly from the struct's payload without a round-trip through the NRT.
+    """
+    __slots__ = ()
+
+    @property
+    def parent(self):
+        return _structref_get_parent(self)
@@ -0,0 +1,285 @@
+"""Soak test for the pass-thru boxing paths.
+
+Runs every case in ``CASES`` for many rounds across several threads and fails as soon as NRT allocations, Python
+refcounts of the objects involved or the resident set size drift. Not collected by pytest, run as
+``python numba_passthru/test/soak.py --rounds 1000000 --threads 4`` with ``numba_passthru`` installed.
+
+Older Numba versions keep a reference to the argument type in ``Dispatcher._types_active_call`` for every call
+resolving an argument type via ``typeof_impl``, ie for every pass-thru argument, and never clear it outside of
+compilation. The harness clears it on the dispatchers in ``DISPATCHERS`` after every round so only leaks in the
+pass-thru paths show up as RSS growth.
+
+RSS is read from ``/proc``, elsewhere the peak RSS is used which cannot shrink, hence RSS drift checking is only
+exact on Linux.
+"""
+from argparse import ArgumentParser
+import gc
+import resource
+from sys import getrefcount, platform
+import threading
+import time
+
+from numba import jit, typed
+from numba.core.runtime.nrt import rtsys
+from numba_passthru import from_pass_thru_list, PassThruContainer, pass_thru_type, to_pass_thru_list
+from numba_passthru.structref import _structref_get_parent
+from numba_passthru.typedlist import _from_pass_thru_list, _to_pass_thru_list
+
+from test_passthru import advance, forget, identity, MyPassThru, PassThruComplex, SimState, sim_state_get_t
+
+
+@jit(nopython=True)
+def container_hash(c):
+    return hash(c)
+
+
+def create_tracked():
+    x = MyPassThru()
+    y = MyPassThru()
+    z = MyPassThru()
+    o = PassThruComplex(42, x, typed.List([y, z]))
+
+    broken = PassThruComplex(43, x, typed.List([y, z]))
+    broken.list_attr = None
+
+    return dict(
+        x=x, y=y, z=z, o=o, broken=broken, c=PassThruContainer(x), l=typed.List([x, y, z]), pylist=[x, y, z, x],
+        mixed=[o, x, PassThruContainer(y)], st=SimState(x, 0.)
+    )
+
+
+def soak_box_unbox(t):
+    assert identity(t['x']) is t['x']
+    assert identity(t['o']) is t['o']
+
+
+def soak_typed_list(t):
+    assert identity(t['l'])[1] is t['y']
+    assert from_pass_thru_list(to_pass_thru_list(t['pylist'])) == t['pylist']
+
+
+def soak_mixed_list(t):
+    assert from_pass_thru_list(to_pass_thru_list(t['mixed'], pass_thru_type)) == t['mixed']
+
+
+def soak_container_hash(t):
+    assert container_hash(t['c']) == hash(t['c'])
+
+
+def soak_objmode(t):
+    forget(t['x'])
+
+
+def soak_structref(t):
+    st = advance(t['st'], 0.)
+    assert st.parent is t['x']
+    assert st.t == 0.
+
+
+def soak_unbox_error(t):
+    try:
+        identity(t['broken'])
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("unboxing a broken PassThruComplex did not fail")
+
+
+def soak_typed_list_error(t):
+    try:
+        to_pass_thru_list([t['o'], t['broken']])
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("to_pass_thru_list on a broken PassThruComplex did not fail")
+
+    try:
+        to_pass_thru_list([t['x'], t['o']])
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("to_pass_thru_list on mixed types did not fail")
+
+
+CASES = dict(
+    box_unbox=soak_box_unbox,
+    typed_list=soak_typed_list,
+    mixed_list=soak_mixed_list,
+    container_hash=soak_container_hash,
+    objmode=soak_objmode,
+    structref=soak_structref,
+    unbox_error=soak_unbox_error,
+    typed_list_error=soak_typed_list_error
+)
+
+
+# all dispatchers called with pass-thru arguments by CASES
+DISPATCHERS = (
+    advance, container_hash, forget, identity, sim_state_get_t, _from_pass_thru_list, _structref_get_parent,
+    _to_pass_thru_list
+)
+
+
+def clear_types_active_call():
+    for dispatcher in DISPATCHERS:
+        # a list in older Numba versions, a set in later ones
+        dispatcher._types_active_call.clear()
+
+
+def rss():
+    """Returns the resident set size in bytes, falls back to the peak resident set size where ``/proc`` is not
+       available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # bytes on macOS, kilobytes elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if platform == 'darwin' else 1024)
+
+
+def outstanding_allocations():
+    stats = rtsys.get_allocation_stats()
+
+    return stats.alloc - stats.free
+
+
+def run_soak(rounds=1000000, threads=4, report_every=10., rss_tolerance=16 * 2**20, report=print):
+    """Runs each of ``CASES`` ``rounds`` times in each of ``threads`` threads. Every ``report_every`` seconds the
+       threads are parked between rounds to report throughput and resource usage. The run stops at the first
+       change of NRT allocations or refcounts or RSS growing by more than ``rss_tolerance`` bytes. Returns the
+       sustained throughput per case in calls per second spent in the case.
+    """
+    tracked = create_tracked()
+
+    # compile everything and let caches settle before taking the baseline
+    for case in CASES.values():
+        for _ in range(10):
+            case(tracked)
+    clear_types_active_call()
+    gc.collect()
+
+    refcounts = {k: getrefcount(v) for k, v in tracked.items()}
+    allocations = outstanding_allocations()
+    rss_before = rss()
+
+    calls = {name: 0 for name in CASES}
+    durations = {name: 0. for name in CASES}
+    errors = []
+    lock = threading.Lock()
+
+    # workers park between rounds while state['checkpoint'] is set
+    cond = threading.Condition()
+    state = dict(checkpoint=False, stop=False, parked=0, running=threads)
+
+    def soak():
+        try:
+            for _ in range(rounds):
+                with cond:
+                    if state['checkpoint']:
+                        state['parked'] += 1
+                        cond.notify_all()
+                        cond.wait_for(lambda: not state['checkpoint'])
+                        state['parked'] -= 1
+                    if state['stop']:
+                        break
+
+                for name, case in CASES.items():
+                    start = time.perf_counter()
+                    case(tracked)
+                    duration = time.perf_counter() - start
+                    with lock:
+                        calls[name] += 1
+                        durations[name] += duration
+                clear_types_active_call()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            with cond:
+                state['running'] -= 1
+                cond.notify_all()
+
+    def check():
+        """Returns a description of any drift since the baseline, ``None`` if there is none.
+        """
+        gc.collect()
+        drift = []
+
+        nrt = outstanding_allocations() - allocations
+        if nrt:
+            drift.append("NRT allocations drifted by {:+d}".format(nrt))
+
+        refcounts_now = {k: getrefcount(v) for k, v in tracked.items()}
+        changed = {k: (refcounts[k], refcounts_now[k]) for k in refcounts if refcounts[k] != refcounts_now[k]}
+        if changed:
+            drift.append(
+                "refcounts drifted: {}".format(", ".join("{} {} -> {}".format(k, *v) for k, v in sorted(changed.items())))
+            )
+
+        rss_growth = rss() - rss_before
+        if rss_growth > rss_tolerance:
+            drift.append(
+                "RSS grew by {:.2f}MB, tolerance is {:.2f}MB".format(rss_growth / 2**20, rss_tolerance / 2**20)
+            )
+
+        return "; ".join(drift) or None
+
+    workers = [threading.Thread(target=soak, name='soak-{}'.format(ii), daemon=True) for ii in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+
+    next_report = start + report_every
+    while True:
+        for worker in workers:
+            worker.join(max(0., next_report - time.perf_counter()))
+        next_report += report_every
+
+        with cond:
+            state['checkpoint'] = True
+            cond.wait_for(lambda: state['parked'] == state['running'])
+        try:
+            now = time.perf_counter()
+            report(
+                "{:8.1f}s {:10d} calls {:10.0f} calls/s rss {:+8.2f}MB nrt {:+6d}".format(
+                    now - start, sum(calls.values()), sum(calls.values()) / (now - start), (rss() - rss_before) / 2**20,
+                    outstanding_allocations() - allocations
+                )
+            )
+            drift = check()
+            done = state['running'] == 0
+            state['stop'] = bool(drift or errors)
+        finally:
+            with cond:
+                state['checkpoint'] = False
+                cond.notify_all()
+
+        if state['stop'] or done:
+            break
+
+    for worker in workers:
+        worker.join()
+
+    if errors:
+        raise errors[0]
+    if drift:
+        raise AssertionError("after {:.1f}s: {}".format(now - start, drift))
+
+    throughput = {name: calls[name] / durations[name] for name in CASES}
+    for name in CASES:
+        report(
+            "{:>16}: {:10.0f} calls/s {:8.2f}us/call".format(name, throughput[name], 1e6 / throughput[name])
+        )
+
+    return throughput
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=1000000, help="rounds through all cases per thread")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--report-every', type=float, default=10., help="seconds between reports")
+    parser.add_argument('--rss-tolerance', type=float, default=16., help="maximum RSS growth in MB")
+    args = parser.parse_args()
+
+    run_soak(args.rounds, args.threads, args.report_every, args.rss_tolerance * 2**20)
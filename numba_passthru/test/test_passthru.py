@@ -1,15 +1,27 @@
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 import gc
+import pickle
 from numba import jit, objmode, typed, types, TypingError
 from numba.core import cgutils
 from numba.core.config import MACHINE_BITS
 from numba.core.datamodel import models
 from numba.extending import box, NativeValue, register_model, typeof_impl, unbox, make_attribute_wrapper
 from numba.core.runtime.nrt import rtsys
-from numba_passthru import PassThruContainer, PassThruType, pass_thru_type
+from numba.experimental import structref
+from numba_passthru import (
+    from_pass_thru_list, PassThruContainer, PassThruStructRef, PassThruStructRefProxy, PassThruType, pass_thru_type,
+    to_pass_thru_list
+)
 import pytest
 from sys import getrefcount
 
+try:
+    from multiprocessing import shared_memory
+    from numba_passthru import SharedPassThruRecords
+except ImportError:  # multiprocessing.shared_memory requires Python 3.8
+    SharedPassThruRecords = None
+
 
 @contextmanager
 def check_numba_allocations(self, create_tracked_objects=lambda: {}, extra_allocations=0, refcount_changes={}):
@@ -268,6 +280,65 @@ class TestMyPassThru:
 
             del x, y, z, l, l2, l3
 
+    def test_to_pass_thru_list(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            l = to_pass_thru_list([x, y, z, x])
+
+            assert l._list_type == types.ListType(my_pass_thru_type)
+            assert len(l) == 4
+            assert l[0] is x
+            assert l[1] is y
+            assert l[2] is z
+            assert l[3] is x
+            del x, y, z, l
+
+    def test_to_pass_thru_list_item_type(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=PassThruContainer(1)))) as (x, y):
+            l = to_pass_thru_list((x, y), pass_thru_type)
+            l2 = to_pass_thru_list([], pass_thru_type)
+            l3 = to_pass_thru_list([])
+
+            assert l._list_type == types.ListType(pass_thru_type)
+            assert l[0] is x
+            assert l[1] is y
+            assert len(l2) == 0
+            assert l3._list_type == types.ListType(pass_thru_type)
+            del x, y, l, l2, l3
+
+    def test_to_pass_thru_list_mixed(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=PassThruContainer(1)))) as (x, y):
+            for l in ([x, y], [x, x, 1], [x, "s"]):
+                with pytest.raises(TypeError) as context:
+                    to_pass_thru_list(l)
+
+                assert "items need to be of the same type, got <class 'test_passthru.MyPassThru'> and" in str(context.value)
+
+            del l, context, x, y
+
+    def test_from_pass_thru_list(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            l = from_pass_thru_list(typed.List([x, y, z, x]))
+            l2 = from_pass_thru_list(typed.List.empty_list(my_pass_thru_type))
+
+            assert type(l) is list
+            assert l == [x, y, z, x]
+            assert l2 == []
+            del x, y, z, l, l2
+
+    def test_pass_thru_list_roundtrip(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            l = from_pass_thru_list(identity(to_pass_thru_list([x, y])))
+
+            assert l == [x, y]
+            del x, y, l
+
+    def test_pass_thru_list_not_pass_thru(self):
+        with pytest.raises(TypingError):
+            to_pass_thru_list([1, 2])
+
+        with pytest.raises(TypingError):
+            from_pass_thru_list(typed.List([1, 2]))
+
 
 ############################# PassThruComplex #############################
 # pass through extension type with several attrs accessible from nopython,
@@ -316,26 +387,34 @@ def type_my_pass_thru_complex(val, context):
 
 @unbox(PassThruComplexType)
 def unbox_passthru_complex(typ, obj, context):
-    pass_thru = cgutils.create_struct_proxy(typ)(context.context, context.builder)
+    builder = context.builder
+    pass_thru = cgutils.create_struct_proxy(typ)(context.context, builder)
 
     pass_thru.parent = context.unbox(pass_thru_type, obj).value
 
-    int_attr = context.pyapi.object_getattr_string(obj, 'int_attr')
-    pass_thru.int_attr = context.unbox(types.intp, int_attr).value
-    context.pyapi.decref(int_attr)
-
-    passthru_attr = context.pyapi.object_getattr_string(obj, 'passthru_attr')
-    pass_thru.passthru_attr = context.unbox(pass_thru_type, passthru_attr).value
-    context.pyapi.decref(passthru_attr)
-
-    list_attr = context.pyapi.object_getattr_string(obj, 'list_attr')
-    pass_thru.list_attr = context.unbox(types.ListType(pass_thru_type), list_attr).value
-    context.pyapi.decref(list_attr)
+    # stop at the first error, members not unboxed yet stay zero-initialised
+    is_error = cgutils.alloca_once_value(builder, cgutils.false_bit)
+    for name, attr_type in (
+            ('int_attr', types.intp),
+            ('passthru_attr', pass_thru_type),
+            ('list_attr', types.ListType(pass_thru_type))
+    ):
+        with builder.if_then(builder.not_(builder.load(is_error))):
+            attr = context.pyapi.object_getattr_string(obj, name)
+            with builder.if_else(cgutils.is_null(builder, attr)) as (no_attr, has_attr):
+                with no_attr:
+                    builder.store(cgutils.true_bit, is_error)
+                with has_attr:
+                    native_attr = context.unbox(attr_type, attr)
+                    context.pyapi.decref(attr)
+                    setattr(pass_thru, name, native_attr.value)
+                    builder.store(native_attr.is_error, is_error)
 
-    # should have done this more often, errors most likely erased by subsequent pyapi call anyway ...
-    is_error = cgutils.is_not_null(context.builder, context.pyapi.err_occurred())
+    # the caller will not clean up after a failed unbox, release whatever got unboxed so far
+    with builder.if_then(builder.load(is_error)):
+        context.context.nrt.decref(builder, typ, pass_thru._getvalue())
 
-    return NativeValue(pass_thru._getvalue(), is_error=is_error)
+    return NativeValue(pass_thru._getvalue(), is_error=builder.load(is_error))
 
 
 @box(PassThruComplexType)
@@ -482,6 +561,299 @@ class TestPassThruComplex:
 
             del a, b, x, y
 
+    def test_pass_thru_list(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            o1 = PassThruComplex(42, x, typed.List([y, z]))
+            o2 = PassThruComplex(43, y, typed.List([z]))
+
+            l = to_pass_thru_list([o1, o2])
+            value = attr_access(l[1], 'int_attr')
+            l2 = from_pass_thru_list(l)
+
+            assert value == 43
+            assert l2 == [o1, o2]
+            del o1, o2, l, l2, x, y, z
+
+    def test_pass_thru_list_unbox_error(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            o1 = PassThruComplex(42, x, typed.List([y, z]))
+            o2 = PassThruComplex(43, x, typed.List([y, z]))
+            o2.list_attr = None
+
+            with pytest.raises(TypeError) as context:
+                to_pass_thru_list([o1, o2])
+
+            del o1, o2, context, x, y, z
+
+    def test_unbox_error(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            o1 = PassThruComplex(42, x, typed.List([y, z]))
+            o1.int_attr = None
+            o2 = PassThruComplex(42, x, typed.List([y, z]))
+            del o2.passthru_attr
+            o3 = PassThruComplex(42, x, typed.List([y, z]))
+            o3.list_attr = None
+
+            with pytest.raises(TypeError) as context:
+                identity(o1)
+
+            with pytest.raises(AttributeError) as context:
+                identity(o2)
+
+            with pytest.raises(TypeError) as context:
+                identity(o3)
+
+            del o1, o2, o3, context, x, y, z
+
+
+########################## SharedPassThruRecords #########################
+# native attributes of PassThruComplex exported into shared memory, kernels
+# running in worker processes see the records but not the objects
+###########################################################################
+@jit(nopython=True)
+def argmax_int_attr(records):
+    return records.int_attr.argmax()
+
+
+def shared_argmax_int_attr(shared):
+    try:
+        return argmax_int_attr(shared.records)
+    finally:
+        shared.close()
+
+
+@pytest.mark.skipif(SharedPassThruRecords is None, reason="multiprocessing.shared_memory requires Python 3.8")
+class TestSharedPassThruRecords:
+    def test_export(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            objs = [PassThruComplex(ii, x, typed.List([y])) for ii in (3, 5, 4)]
+
+            with SharedPassThruRecords(objs, ['int_attr']) as shared:
+                assert len(shared) == 3
+                assert list(shared.records['int_attr']) == [3, 5, 4]
+                assert shared.lookup([argmax_int_attr(shared.records)]) == [objs[1]]
+
+            assert shared.records is None
+            del objs, shared, x, y
+
+    def test_pickle(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            objs = [PassThruComplex(ii, x, typed.List([y])) for ii in (3, 5, 4)]
+
+            with SharedPassThruRecords(objs, ['int_attr']) as shared:
+                with pickle.loads(pickle.dumps(shared)) as attached:
+                    attached.records['int_attr'][0] = 6
+
+                    assert len(pickle.dumps(shared)) < 200
+                    assert list(shared.records['int_attr']) == [6, 5, 4]
+
+                    with pytest.raises(RuntimeError):
+                        attached.lookup([0])
+
+            del objs, shared, attached, x, y
+
+    def test_process_pool(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            objs = [PassThruComplex(ii, x, typed.List([y])) for ii in (3, 5, 4)]
+
+            with SharedPassThruRecords(objs, ['int_attr']) as shared:
+                with ProcessPoolExecutor(1) as pool:
+                    handle = pool.submit(shared_argmax_int_attr, shared).result()
+
+                assert shared.lookup([handle]) == [objs[1]]
+
+            del objs, shared, x, y
+
+    def test_view_past_close(self):
+        objs = [PassThruComplex(ii, MyPassThru(), typed.List([MyPassThru()])) for ii in (3, 5, 4)]
+
+        shared = SharedPassThruRecords(objs, ['int_attr'])
+        name = shared._shm.name
+        view = shared.records[1:]
+
+        with pytest.raises(BufferError):
+            shared.close()
+
+        # the block stays mapped while the view is alive but is unlinked already
+        assert list(view['int_attr']) == [5, 4]
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+        del view
+        shared.close()
+        assert shared.records is None
+
+    def test_empty(self):
+        with SharedPassThruRecords([], ['int_attr'], PassThruComplexType()) as shared:
+            assert len(shared) == 0
+            assert shared.records.dtype.names == ('int_attr',)
+            assert shared.lookup([]) == []
+
+        with pytest.raises(ValueError):
+            SharedPassThruRecords([], ['int_attr'])
+
+    def test_unknown_attr(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            objs = [PassThruComplex(1, x, typed.List([y]))]
+
+            with pytest.raises(TypingError) as context:
+                SharedPassThruRecords(objs, ['not_there'])
+
+            assert "has no attribute 'not_there'" in str(context.value)
+
+            with pytest.raises(TypingError) as context:
+                SharedPassThruRecords(objs, ['int_attr', 'passthru_attr'])
+
+            assert "attribute 'passthru_attr' of type PassThruType has no NumPy dtype" in str(context.value)
+            del objs, context, x, y
+
+
+############################### SimState ###############################
+# mutable structref holding a pass through link to its Python parent,
+# mutations from nopython are visible through any proxy of the struct
+########################################################################
+@structref.register
+class SimStateType(PassThruStructRef):
+    pass
+
+
+class SimState(PassThruStructRefProxy):
+    @property
+    def t(self):
+        return sim_state_get_t(self)
+
+
+structref.define_proxy(SimState, SimStateType, ['parent', 't'])
+
+
+@jit(nopython=True)
+def sim_state_get_t(st):
+    return st.t
+
+
+@jit(nopython=True)
+def advance(st, dt):
+    st.t += dt
+
+    return st
+
+
+class NoParentType(PassThruType):
+    def __init__(self):
+        super(NoParentType, self).__init__()
+
+
+@register_model(NoParentType)
+class NoParentModel(models.StructModel):
+    def __init__(self, dmm, fe_typ):
+        members = [
+            ('int_attr', types.intp),
+        ]
+        super(NoParentModel, self).__init__(dmm, fe_typ, members)
+
+
+class TestPassThruStructRef:
+    def test_parent(self):
+        with check_numba_allocations(self, (lambda: dict(o=MyPassThru()))) as (o,):
+            st = SimState(o, 0.)
+
+            assert st.parent is o
+            assert st.t == 0.
+            del st, o
+
+    def test_mutation(self):
+        with check_numba_allocations(self, (lambda: dict(o=MyPassThru()))) as (o,):
+            st = SimState(o, 0.)
+
+            for _ in range(3):
+                st2 = advance(st, .5)
+
+            assert st.t == 1.5
+            assert st2.t == 1.5
+            assert st2.parent is o
+            del st, st2, o
+
+    def test_create(self):
+        @jit(nopython=True)
+        def create_sim_state(o):
+            st = SimState(o, 1.)
+            st.t += 1.
+
+            return st, st.parent
+
+        with check_numba_allocations(self, (lambda: dict(o=MyPassThru()))) as (o,):
+            st, o2 = create_sim_state(o)
+
+            assert st.t == 2.
+            assert st.parent is o
+            assert o2 is o
+            del st, o, o2
+
+    def test_set_parent(self):
+        @jit(nopython=True)
+        def set_parent(st, o):
+            st.parent = o
+
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            st = SimState(x, 0.)
+            set_parent(st, y)
+
+            assert st.parent is y
+            del st, x, y
+
+    def test_complex_parent(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru(), z=MyPassThru()))) as (x, y, z):
+            o = PassThruComplex(42, x, typed.List([y, z]))
+            st = advance(SimState(o, 0.), 1.)
+
+            assert st.parent is o
+            assert st.t == 1.
+            del st, o, x, y, z
+
+    def test_container_parent(self):
+        with check_numba_allocations(self, (lambda: dict(c=PassThruContainer(1)))) as (c,):
+            st = advance(SimState(c, 0.), 1.)
+
+            assert st.parent is c
+            assert st.t == 1.
+            del st, c
+
+    def test_unboxable_parent(self):
+        with pytest.raises(TypingError) as context:
+            SimStateType([('parent', NoParentType()), ('t', types.float64)])
+
+        assert "NoParentType has none of the members 'meminfo', 'parent' or 'container'" in str(context.value)
+
+    def test_list(self):
+        with check_numba_allocations(self, (lambda: dict(x=MyPassThru(), y=MyPassThru()))) as (x, y):
+            l = typed.List([SimState(x, 0.), SimState(y, 1.)])
+            l2 = identity(l)
+
+            assert l2[0].parent is x
+            assert l2[1].parent is y
+            assert l2[1].t == 1.
+            del l, l2, x, y
+
+    def test_no_parent(self):
+        with pytest.raises(TypingError) as context:
+            SimStateType([('t', types.float64)])
+
+        assert "SimStateType requires a pass-thru member 'parent'" in str(context.value)
+
+
+################################## soak ##################################
+# short run of the soak harness, see soak.py for the long-running version
+##########################################################################
+class TestSoak:
+    def test_soak(self):
+        from soak import CASES, run_soak
+
+        throughput = run_soak(rounds=50, threads=2, report=lambda line: None)
+
+        assert set(throughput) == set(CASES)
+        assert all(v > 0 for v in throughput.values())
+        assert len(set(throughput.values())) == len(CASES)
+
 
 ############################ test functions ############################
 # test function for basic allocation tests
@@ -0,0 +1,138 @@
+from numba import njit, typeof
+from numba.core import cgutils, types
+from numba.core.errors import TypingError
+from numba.extending import intrinsic
+from numba.typed import listobject
+
+from .numba_passthru import PassThruContainer, PassThruType, pass_thru_type
+
+
+__all__ = ['from_pass_thru_list', 'to_pass_thru_list']
+
+
+@intrinsic
+def _unbox_pylist(tyctx, obj, item_type, same_type):
+    if not isinstance(item_type.instance_type, PassThruType):
+        raise TypingError("{} is not a pass-thru type".format(item_type.instance_type))
+
+    item_type = item_type.instance_type
+    list_type = types.ListType(item_type)
+    funtion_sig = list_type(obj, types.TypeRef(item_type), same_type)
+
+    def make_list(n):
+        return listobject.new_list(item_type, n)
+
+    def append(l, item):
+        l.append(item)
+
+    def codegen(cgctx, builder, signature, args):
+        pyapi = cgctx.get_python_api(builder)
+        n = pyapi.list_size(args[0])
+
+        l = cgctx.compile_internal(builder, make_list, list_type(types.intp), (n,))
+
+        # the unboxer of an inferred item type must only see instances of the type it was inferred from
+        first_type = cgutils.alloca_once_value(builder, cgutils.get_null_value(pyapi.pyobj))
+        with builder.if_then(builder.and_(args[2], builder.icmp_signed('>', n, n.type(0))), likely=False):
+            builder.store(pyapi.get_type(pyapi.list_getitem(args[0], n.type(0))), first_type)
+        first_type = builder.load(first_type)
+
+        with cgutils.for_range(builder, n) as loop:
+            item = pyapi.list_getitem(args[0], loop.index)  # borrowed
+
+            with builder.if_then(args[2], likely=False):
+                item_type_obj = pyapi.get_type(item)
+                with cgutils.if_unlikely(builder, builder.icmp_unsigned('!=', item_type_obj, first_type)):
+                    cgctx.nrt.decref(builder, list_type, l)
+                    pyapi.err_format(
+                        "PyExc_TypeError", "items need to be of the same type, got %R and %R", first_type, item_type_obj
+                    )
+                    cgctx.call_conv.return_exc(builder)
+
+            native = pyapi.to_native_value(item_type, item)
+
+            with cgutils.if_unlikely(builder, native.is_error):
+                cgctx.nrt.decref(builder, list_type, l)
+                cgctx.call_conv.return_exc(builder)
+
+            cgctx.compile_internal(builder, append, types.none(list_type, item_type), (l, native.value))
+            cgctx.nrt.decref(builder, item_type, native.value)
+            if native.cleanup is not None:
+                native.cleanup()
+
+        return l
+
+    return funtion_sig, codegen
+
+
+@intrinsic
+def _box_typed_list(tyctx, l):
+    if not isinstance(l, types.ListType) or not isinstance(l.item_type, PassThruType):
+        raise TypingError("{} is not a typed list of a pass-thru type".format(l))
+
+    funtion_sig = pass_thru_type(l)
+
+    def length(l):
+        return len(l)
+
+    def getitem(l, i):
+        return l[i]
+
+    def codegen(cgctx, builder, signature, args):
+        list_type = signature.args[0]
+        item_type = list_type.item_type
+        pyapi = cgctx.get_python_api(builder)
+
+        n = cgctx.compile_internal(builder, length, types.intp(list_type), args)
+        obj = pyapi.list_new(n)
+        with cgutils.if_unlikely(builder, cgutils.is_null(builder, obj)):
+            cgctx.call_conv.return_exc(builder)
+
+        with cgutils.for_range(builder, n) as loop:
+            item = cgctx.compile_internal(builder, getitem, item_type(list_type, types.intp), (args[0], loop.index))
+            item_obj = pyapi.from_native_value(item_type, item)  # steals the reference on item
+
+            with cgutils.if_unlikely(builder, cgutils.is_null(builder, item_obj)):
+                pyapi.decref(obj)
+                cgctx.call_conv.return_exc(builder)
+
+            pyapi.list_setitem(obj, loop.index, item_obj)  # steals the reference on item_obj
+
+        # hand the new list over to a pass_thru_type to get it boxed on return
+        pass_thru = cgutils.create_struct_proxy(pass_thru_type)(cgctx, builder)
+        pass_thru.meminfo = pyapi.nrt_meminfo_new_from_pyobject(obj, obj)
+        pyapi.decref(obj)
+
+        return pass_thru._getvalue()
+
+    return funtion_sig, codegen
+
+
+@njit
+def _to_pass_thru_list(container, item_type, same_type):
+    return _unbox_pylist(container.wrapped_obj, item_type, same_type)
+
+
+@njit
+def _from_pass_thru_list(l):
+    return _box_typed_list(l)
+
+
+def to_pass_thru_list(pylist, item_type=None):
+    """Converts a Python list into a ``typed.List`` of pass-thru values in a single call to *nopython-mode*.
+       ``item_type`` defaults to the type of the first element (``pass_thru_type`` if ``pylist`` is empty), all
+       elements need to be of the same class then.
+    """
+    if not isinstance(pylist, list):
+        pylist = list(pylist)
+    same_type = item_type is None
+    if same_type:
+        item_type = typeof(pylist[0]) if pylist else pass_thru_type
+
+    return _to_pass_thru_list(PassThruContainer(pylist), item_type, same_type)
+
+
+def from_pass_thru_list(tlist):
+    """Converts a ``typed.List`` of pass-thru values into a Python list in a single call to *nopython-mode*.
+    """
+    return _from_pass_thru_list(tlist)